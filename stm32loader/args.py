@@ -3,6 +3,7 @@
 import argparse
 import atexit
 import copy
+import functools
 import os
 import sys
 
@@ -36,6 +37,59 @@ class HelpFormatter(argparse.RawDescriptionHelpFormatter, argparse.ArgumentDefau
         return super()._format_actions_usage(map(tweak_action, actions), groups)
 
 
+class Configuration:
+    """Settings for a stm32loader run, as given on the command line."""
+
+    # A plain record of settings; one attribute per option.
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+
+    __slots__ = (
+        "address",
+        "bitrate",
+        "cache_reads",
+        "data_bitrate",
+        "data_file",
+        "erase",
+        "family",
+        "go_address",
+        "keep_connection",
+        "length",
+        "no_progress",
+        "port",
+        "read",
+        "sndbuf",
+        "txqueuelen",
+        "verbosity",
+        "verify",
+        "verify_fast",
+        "write",
+    )
+
+    def __init__(self, **settings):
+        """Construct a configuration; settings that are not given are None."""
+        self.address = None
+        self.bitrate = None
+        self.cache_reads = None
+        self.data_bitrate = None
+        self.data_file = None
+        self.erase = None
+        self.family = None
+        self.go_address = None
+        self.keep_connection = None
+        self.length = None
+        self.no_progress = None
+        self.port = None
+        self.read = None
+        self.sndbuf = None
+        self.txqueuelen = None
+        self.verbosity = DEFAULT_VERBOSITY
+        self.verify = None
+        self.verify_fast = None
+        self.write = None
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+
 def _auto_int(x):
     """Convert to int with automatic base detection."""
     # This supports 0x10 == 16 and 10 == 10
@@ -43,7 +97,18 @@ def _auto_int(x):
 
 
 def parse_arguments(arguments):
-    """Parse the given command-line arguments and return the configuration."""
+    """
+    Parse the given command-line arguments and return the configuration.
+
+    Results are cached, so parsing the same arguments again is cheap.
+    Each call returns its own copy of the configuration.
+    """
+    return copy.copy(_parse_arguments(tuple(arguments)))
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_arguments(arguments):
+    """Parse a tuple of command-line arguments; see parse_arguments()."""
 
     parser = argparse.ArgumentParser(
         prog="stm32loader",
@@ -85,6 +150,15 @@ def parse_arguments(arguments):
         help="Verify flash content versus local file (recommended).",
     )
 
+    parser.add_argument(
+        "--verify-fast",
+        action="store_true",
+        help=(
+            "With --verify: compare a CRC computed by the device instead of reading back"
+            " the flash content, if the bootloader supports it."
+        ),
+    )
+
     parser.add_argument(
         "-r", "--read", action="store_true", help="Read from flash and store in local file."
     )
@@ -100,7 +174,31 @@ def parse_arguments(arguments):
         default="can0",
         help=("CAN port to use.")
     )
-    address_arg = parser.add_argument(
+    parser.add_argument(
+        "--bitrate",
+        action="store",
+        type=_auto_int,
+        help="(Re)configure the CAN port with this nominal bitrate (needs root), e.g. 1000000.",
+    )
+    parser.add_argument(
+        "--data-bitrate",
+        action="store",
+        type=_auto_int,
+        help="CAN FD data phase bitrate to use with --bitrate, e.g. 8000000.",
+    )
+    parser.add_argument(
+        "--txqueuelen",
+        action="store",
+        type=_auto_int,
+        help="Set the transmit queue length of the CAN port (needs root), e.g. 500.",
+    )
+    parser.add_argument(
+        "--sndbuf",
+        action="store",
+        type=_auto_int,
+        help="Set the CAN socket send and receive buffer size in bytes, e.g. 0x100000.",
+    )
+    parser.add_argument(
         "-a",
         "--address",
         action="store",
@@ -148,18 +246,42 @@ def parse_arguments(arguments):
         "-n", "--no-progress", action="store_true", help="Don't show progress bar."
     )
 
+    parser.add_argument(
+        "--keep-connection",
+        action="store_true",
+        help=(
+            "Leave the CAN connection open when done, so that later runs"
+            " in the same Python process reuse it."
+        ),
+    )
+
+    parser.add_argument(
+        "--cache-reads",
+        action="store_true",
+        help=(
+            "Remember memory read results until the memory is changed, so that"
+            " the UID and flash size are read from the device only once."
+        ),
+    )
+
     parser.add_argument("--version", action="version", version=__version__)
 
-    configuration = parser.parse_args(arguments)
+    configuration = Configuration(**vars(parser.parse_args(arguments)))
+
+    if configuration.data_bitrate and not configuration.bitrate:
+        parser.error("argument --data-bitrate: requires --bitrate")
 
+    # Some arguments are only required in combination with others;
+    # check those here instead of running the parser a second time.
+    missing = []
     if configuration.read or configuration.write or configuration.verify:
-        data_file_arg.nargs = None
-        data_file_arg.required = True
+        if configuration.data_file is None:
+            missing.append(data_file_arg.metavar)
 
-    if configuration.read:
-        length_arg.required = True
-        address_arg.required = True
+    if configuration.read and configuration.length is None:
+        missing.append("/".join(length_arg.option_strings))
 
-    parser.parse_args(arguments)
+    if missing:
+        parser.error("the following arguments are required: " + ", ".join(missing))
 
     return configuration
@@ -21,13 +21,15 @@
 
 
 import enum
-import math
 import operator
 import struct
 import time
-from functools import reduce
+import zlib
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
 
-from stm32loader.devices import DEVICES, DeviceFamily, DeviceFlag
+from stm32loader import devices
+from stm32loader.devices import DeviceFamily, DeviceFlag
 
 
 CHIP_IDS = {
@@ -86,6 +88,46 @@ CHIP_IDS = {
 }
 
 
+# Number of bytes verify_data() compares at once to find a mismatch.
+_VERIFY_BLOCK = 4096
+
+# Bit-reversal of each byte value.
+_REVERSED_BITS = bytes(int("{:08b}".format(byte)[::-1], 2) for byte in range(256))
+
+
+def _crc32_mpeg2(data):
+    """
+    Return the CRC-32/MPEG-2 of the given bytes.
+
+    This is the bit-reflected twin of zlib's CRC-32, so it is computed
+    with zlib.crc32() (hardware-accelerated on most hosts) on bit-reversed
+    input, with the result bit-reversed back.
+    """
+    reflected_crc = zlib.crc32(data.translate(_REVERSED_BITS)) ^ 0xFFFFFFFF
+    return int("{:032b}".format(reflected_crc)[::-1], 2)
+
+
+# Transfer and flash page size of a device family;
+# see Stm32Bootloader._family_settings().
+FamilySettings = namedtuple("FamilySettings", ["data_transfer_size", "flash_page_size"])
+
+
+def _xor_checksum(data, initial=0):
+    """
+    Return the XOR of all bytes in data, and of initial.
+
+    Instead of one XOR per byte, fold the upper half of the data
+    (as one big integer) onto the lower half until one byte is left.
+    """
+    value = int.from_bytes(data, "little")
+    length = len(data)
+    while length > 1:
+        half = (length + 1) // 2
+        value = (value >> (8 * half)) ^ (value & ((1 << (8 * half)) - 1))
+        length = half
+    return value ^ initial
+
+
 class Stm32LoaderError(Exception):
     """Generic exception type for errors occurring in stm32loader."""
 
@@ -140,6 +182,39 @@ class ShowProgress:
         def finish(self):
             """Do nothing; be compatible to progress.bar.Bar."""
 
+    class _ThrottledProgressBar:
+        """
+        Wrap a progress.bar.Bar to redraw it at most every interval seconds.
+
+        Every redraw writes to the terminal, which would otherwise happen
+        for each transferred chunk.
+        """
+
+        def __init__(self, progress_bar, interval):
+            self._progress_bar = progress_bar
+            self._interval = interval
+            self._pending = 0
+            self._next_update = time.monotonic() + interval
+
+        def next(self):  # noqa
+            """Count one step; redraw when the interval has passed."""
+            self._pending += 1
+            now = time.monotonic()
+            if now >= self._next_update:
+                self._progress_bar.next(self._pending)
+                self._pending = 0
+                self._next_update = now + self._interval
+
+        def finish(self):
+            """Show the remaining steps and finish the progress bar."""
+            if self._pending:
+                self._progress_bar.next(self._pending)
+                self._pending = 0
+            self._progress_bar.finish()
+
+    # Minimum time in seconds between two progress bar redraws.
+    UPDATE_INTERVAL = 0.1
+
     def __init__(self, progress_bar_type):
         """
         Construct the context manager object.
@@ -162,8 +237,9 @@ class ShowProgress:
         if not self.progress_bar_type:
             self.progress_bar = self._NoProgressBar()
         else:
-            self.progress_bar = self.progress_bar_type(
-                message, max=maximum, suffix="%(index)d/%(max)d"
+            self.progress_bar = self._ThrottledProgressBar(
+                self.progress_bar_type(message, max=maximum, suffix="%(index)d/%(max)d"),
+                self.UPDATE_INTERVAL,
             )
 
         return self
@@ -208,6 +284,8 @@ class Stm32Bootloader:
         EXTENDED_ERASE = 0x44
         WRITE_PROTECT = 0x63
         WRITE_UNPROTECT = 0x73
+        # Only supported by recent bootloaders, e.g. STM32H5.
+        GET_CHECKSUM = 0xA1
 
     @enum.unique
     class Reply(enum.IntEnum):
@@ -255,6 +333,8 @@ class Stm32Bootloader:
     }
 
     UID_SWAP = [[1, 0], [3, 2], [7, 6, 5, 4], [11, 10, 9, 8]]
+    # Pick the UID bytes in UID_SWAP order, all at once.
+    _UID_PERMUTATION = operator.itemgetter(*(index for part in UID_SWAP for index in part))
 
     # stm32loader does not know the address for the unique ID
     UID_ADDRESS_UNKNOWN = -1
@@ -352,7 +432,47 @@ class Stm32Bootloader:
 
     SYNCHRONIZE_ATTEMPTS = 2
 
-    def __init__(self, connection, device=None, device_family=None, verbosity=5, show_progress=None):
+    # Plain int copies of codes used for every block or reply,
+    # so that the transfer loops skip the enum attribute lookups.
+    _ACK = int(Reply.ACK)
+    _READ_MEMORY = int(Command.READ_MEMORY)
+    _WRITE_MEMORY = int(Command.WRITE_MEMORY)
+
+    # Commands that can not change the memory content; any other
+    # command empties the read cache.
+    _READ_ONLY_COMMANDS = frozenset(
+        [
+            Command.GET,
+            Command.GET_VERSION,
+            Command.GET_ID,
+            Command.READ_MEMORY,
+            Command.GET_CHECKSUM,
+        ]
+    )
+    # Maximum number of bytes kept in the read cache.
+    READ_CACHE_SIZE = 64 * 1024
+
+    # Command frames, packed big-endian with unsigned fields.
+    # Command, address, byte count - 1.
+    _MEMORY_COMMAND = struct.Struct(">BIB")
+    # Command, address.
+    _GO_COMMAND = struct.Struct(">BI")
+    # Command, page count - 1 or special erase code.
+    _EXTENDED_ERASE_COMMAND = struct.Struct(">BH")
+    # Command, address, word count.
+    _CHECKSUM_COMMAND = struct.Struct(">BII")
+    # Address, checksum.
+    _ADDRESS = struct.Struct(">IB")
+
+    def __init__(
+        self,
+        connection,
+        device=None,
+        device_family=None,
+        verbosity=5,
+        show_progress=None,
+        cache_reads=False,
+    ):
         """
         Construct the Stm32Bootloader object.
 
@@ -364,32 +484,48 @@ class Stm32Bootloader:
         :param int verbosity: Verbosity level. 0 is quite, 10 is verbose.
         :param ShowProgress show_progress: ShowProgress context manager.
            Set to None to disable progress bar output.
+        :param bool cache_reads: Remember the results of read_memory_data()
+           and of the UID and flash size reads until a command that
+           may change the memory is sent.
         """
         self.connection = connection
         self.verbosity = verbosity
         self.show_progress = show_progress or ShowProgress(None)
         self.extended_erase = False
+        self.supported_commands = frozenset()
+        # Bit n is set if command n is in supported_commands.
+        self._command_mask = 0
+        self._write_scratch = bytearray()
+        # (address, length) -> data, least recently used first.
+        self._read_cache = OrderedDict() if cache_reads else None
+        self._read_cache_bytes = 0
 
-        self.data_transfer_size = self.DATA_TRANSFER_SIZE.get("default")
-        if self.DATA_TRANSFER_SIZE.get(device_family) is not None:
-            self.data_transfer_size = self.DATA_TRANSFER_SIZE.get(device_family)
-
-        self.flash_page_size = self.FLASH_PAGE_SIZE.get("default")
-        if self.FLASH_PAGE_SIZE.get(device_family) is not None:
-            self.flash_page_size = self.FLASH_PAGE_SIZE.get(device_family)
-        
-        self.flash_page_size = self.FLASH_SIZE_ADDRESS.get("default")
-        if self.FLASH_SIZE_ADDRESS.get(device_family) is not None:
-            self.flash_page_size = self.FLASH_SIZE_ADDRESS.get(device_family)
+        self.data_transfer_size, self.flash_page_size = self._family_settings(device_family)
 
         self.device_family = device_family or "F1"
         self.device = device
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _family_settings(cls, device_family):
+        """Return the FamilySettings of the given family, or the defaults."""
+
+        def lookup(table):
+            value = table.get(device_family)
+            return table["default"] if value is None else value
+
+        return FamilySettings(lookup(cls.DATA_TRANSFER_SIZE), lookup(cls.FLASH_PAGE_SIZE))
+
     def write(self, *data):
-        """Write the given data to the MCU."""
+        """
+        Write the given data to the MCU.
+
+        Each argument (an integer or bytes) is sent as a transfer of its own.
+        Callers that need a single frame build one payload buffer.
+        """
         for data_bytes in data:
             if isinstance(data_bytes, int):
-                data_bytes = struct.pack("B", data_bytes)
+                data_bytes = bytes((data_bytes,))
             self.connection.write(data_bytes)
 
     def write_and_ack(self, message, *data):
@@ -400,14 +536,18 @@ class Stm32Bootloader:
         while msg is None:
             self.write(*data)
             ack, msg = self.connection.readnewint()
-        if (ack != self.Reply.ACK):
+        if (ack != self._ACK):
             self.debug(0, "No ack for " + message)
-        return (ack == self.Reply.ACK)
+        return (ack == self._ACK)
 
-    def debug(self, level, message):
-        """Print the given message if its level is low enough."""
+    def debug(self, level, message, *args):
+        """
+        Print the given message if its level is low enough.
+
+        Any args are %-formatted into the message only when it is printed.
+        """
         if self.verbosity >= level:
-            print(message)
+            print(message % args if args else message)
 
     def command(self, command, description):
         """
@@ -415,7 +555,12 @@ class Stm32Bootloader:
 
         Raise CommandError if there's no ACK replied.
         """
-        self.debug(10, "*** Command: %s" % description)
+        self.debug(10, "*** Command: %s", description)
+        if self._read_cache:
+            command_code = command if isinstance(command, int) else command[0]
+            if command_code not in self._READ_ONLY_COMMANDS:
+                self._read_cache.clear()
+                self._read_cache_bytes = 0
         ack_received = self.write_and_ack("Command", command)
 
         if not ack_received:
@@ -429,20 +574,35 @@ class Stm32Bootloader:
             numcmds, msg = self.connection.readnewint()
             version, msg = self.connection.readnewint()
 
+            # Over CAN, each supported command arrives in a frame of its own.
             supported_commands = []
-            for i in range(0,numcmds):
-                cmd, msg = self.connection.readnewint()
-                supported_commands.append(cmd)
+            for _command in range(numcmds):
+                command, msg = self.connection.readnewint()
+                if command is None:
+                    raise CommandError("Get: timeout reading supported commands")
+                supported_commands.append(command)
+            self.supported_commands = frozenset(supported_commands)
             ack, msg = self.connection.readnewint()
             if ack != self.Reply.ACK:
                 self.debug(0, "Get command not completed")
 
-            self.supported_commands = {command: True for command in supported_commands}
-            self.extended_erase = self.Command.EXTENDED_ERASE in self.supported_commands
-            self.debug(20, "    Available commands: " + ", ".join(hex(b) for b in self.supported_commands))
+            self._command_mask = 0
+            for command in self.supported_commands:
+                self._command_mask |= 1 << command
+            self.extended_erase = self._supports(self.Command.EXTENDED_ERASE)
+            if self.verbosity >= 20:
+                self.debug(
+                    20,
+                    "    Available commands: %s",
+                    ", ".join(hex(b) for b in self.supported_commands),
+                )
             return version
         return None
     
+    def _supports(self, command):
+        """Return True if the command was listed in the Get reply."""
+        return bool((self._command_mask >> command) & 1)
+
     def get_version(self):
         """
         Return the bootloader protocol version.
@@ -456,9 +616,9 @@ class Stm32Bootloader:
         option_byte1 = data[1]
         option_byte2 = data[2]
         self._wait_for_ack("0x01 end")
-        self.debug(10, "    Bootloader version: " + hex(version))
-        self.debug(10, "    Option byte 1: " + hex(option_byte1))
-        self.debug(10, "    Option byte 2: " + hex(option_byte2))
+        self.debug(10, "    Bootloader version: 0x%X", version)
+        self.debug(10, "    Option byte 1: 0x%X", option_byte1)
+        self.debug(10, "    Option byte 2: 0x%X", option_byte2)
         return version
 
     def get_id(self):
@@ -479,7 +639,7 @@ class Stm32Bootloader:
             flash_size, _uid = self.get_flash_size_and_uid()
             return flash_size
 
-        flash_size_data = self.read_memory(self.device.family.flash_size_address, 2)
+        flash_size_data = self._read_device_info(self.device.family.flash_size_address, 2)
         flash_size = flash_size_data[0] + (flash_size_data[1] << 8)
         return flash_size
 
@@ -504,13 +664,13 @@ class Stm32Bootloader:
         flash_size_lsb_address = flash_size_address - data_start_address
         uid_lsb_address = uid_address - data_start_address
 
-        self.debug(10, "flash_size_address = 0x%X" % flash_size_address)
-        self.debug(10, "uid_address = 0x%X" % uid_address)
+        self.debug(10, "flash_size_address = 0x%X", flash_size_address)
+        self.debug(10, "uid_address = 0x%X", uid_address)
         # self.debug(10, 'data_start_address =0x%X' % data_start_address)
         # self.debug(10, 'flashsizelsbaddress =0x%X' % flash_size_lsb_address)
         # self.debug(10, 'uid_lsb_address = 0x%X' % uid_lsb_address)
 
-        data = self.read_memory(data_start_address, self.data_transfer_size)
+        data = self._read_device_info(data_start_address, self.data_transfer_size)
         device_uid = data[uid_lsb_address : uid_lsb_address + 12]
         flash_size = data[flash_size_lsb_address] + (data[flash_size_lsb_address + 1] << 8)
 
@@ -531,10 +691,22 @@ class Stm32Bootloader:
         else:
             if not self.device.family.uid_address:
                 return self.UID_NOT_SUPPORTED
-            uid = self.read_memory(self.device.family.uid_address, 12)
+            uid = self._read_device_info(self.device.family.uid_address, 12)
 
         return uid
 
+    def _read_device_info(self, address, length):
+        """
+        Return up to one transfer of memory, such as the UID or flash size.
+
+        Goes through the read cache if enabled, so that repeated lookups,
+        e.g. get_uid() and get_flash_size() on F4 and L0, read the device
+        only once.
+        """
+        if self._read_cache is None:
+            return self.read_memory(address, length)
+        return bytearray(self._cached_read_memory_data(address, length))
+
     def detect_device(self):
         product_id = self.get_id()
 
@@ -543,16 +715,16 @@ class Stm32Bootloader:
             product_id &= 0xFF
 
         # Look up device details based on ID *without* bootloader ID.
-        self.device = DEVICES.get((product_id, None))
+        self.device = devices.lookup(product_id)
 
-        if not self.device:
+        if self.device is None:
             raise DeviceDetectionError(f"Unknown device type: no type known for product id: 0x{product_id:03X}")
 
         # Look up the product's bootloader ID.
         bootloader_id = self.get_bootloader_id()
 
-        # Now we can possibly *refine* the product: look up with product ID *and* bootloader ID.
-        self.device = DEVICES.get((product_id, bootloader_id), self.device)
+        # Now we can possibly *refine* the product with the bootloader ID.
+        self.device = devices.lookup(product_id, bootloader_id)
 
     def get_bootloader_id(self):
         if not self.device.bootloader_id_address:
@@ -572,9 +744,9 @@ class Stm32Bootloader:
         if uid == cls.UID_ADDRESS_UNKNOWN:
             return "UID address unknown"
 
-        swapped_data = [[uid[b] for b in part] for part in Stm32Bootloader.UID_SWAP]
-        uid_string = "-".join("".join(format(b, "02X") for b in part) for part in swapped_data)
-        return uid_string
+        swapped = bytes(cls._UID_PERMUTATION(uid)).hex().upper()
+        # Dashes between the UID_SWAP parts of 2, 2, 4 and 4 bytes.
+        return f"{swapped[0:4]}-{swapped[4:8]}-{swapped[8:16]}-{swapped[16:24]}"
 
     def read_memory(self, address, length):
         """
@@ -585,7 +757,7 @@ class Stm32Bootloader:
         if length > self.data_transfer_size:
             raise DataLengthError("Can not read more than 256 bytes at once.")
 
-        cmd = struct.pack(">biB", self.Command.READ_MEMORY, address, length-1)
+        cmd = self._MEMORY_COMMAND.pack(self._READ_MEMORY, address, length - 1)
         self.command(cmd, "Read memory")
 
         bytestoread = length
@@ -593,21 +765,25 @@ class Stm32Bootloader:
         while bytestoread > 0:
             transfer_bytes = min(bytestoread, self.connection.max_transfer_size)
             chunk, msg = self.connection.read()
+            if chunk is None:
+                raise CommandError(
+                    "Read timed out: %7d bytes address 0x%X..." % (length, address)
+                )
             data += chunk[0:transfer_bytes]
             bytestoread -= transfer_bytes
         
         ack, msg = self.connection.readnewint()
 
-        if (ack == self.Reply.ACK):
+        if (ack == self._ACK):
             return data
-        self.debug(10, "Read failed: %7d bytes address 0x%X..." % (length, address))
+        self.debug(10, "Read failed: %7d bytes address 0x%X...", length, address)
         raise CommandError("Read failed: %7d bytes address 0x%X..." % (length, address))
 
     def go(self, address):
         """Send the 'Go' command to start execution of firmware."""
         # pylint: disable=invalid-name
 
-        cmd = struct.pack(">bI", self.Command.GO, address)
+        cmd = self._GO_COMMAND.pack(self.Command.GO, address)
         ack = self.command(cmd, "Go")
 
         if (not ack):
@@ -628,6 +804,7 @@ class Stm32Bootloader:
         """
         Write the given data to flash at the given address.
 
+        Data can be any bytes-like object, e.g. a memoryview.
         Supports maximum 256 bytes.
         """
         bytestosend = len(data)
@@ -636,7 +813,7 @@ class Stm32Bootloader:
         if bytestosend > self.data_transfer_size:
             raise DataLengthError("Can not write more than 256 bytes at once.")
 
-        cmd = struct.pack(">biB", self.Command.WRITE_MEMORY, address, bytestosend-1)
+        cmd = self._MEMORY_COMMAND.pack(self._WRITE_MEMORY, address, bytestosend - 1)
         self.command(cmd, "Write memory")
         
         # pad data length to multiple of 4 bytes
@@ -644,20 +821,34 @@ class Stm32Bootloader:
             padding_bytes = 4 - (bytestosend % 4)
             bytestosend += padding_bytes
             # append value 0xFF: flash memory value after erase
-            data.extend([0xFF] * padding_bytes)
-
+            data = bytes(data) + b"\xff" * padding_bytes
+
+        # The bootloader only replies once the whole block is received,
+        # so post all of its frames back-to-back before awaiting the ACK.
+        # The frames are views into one reused scratch buffer, each one
+        # the command byte followed by the data.
+        max_transfer_size = self.connection.max_transfer_size
+        frame_count = -(-bytestosend // max_transfer_size)
+        scratch = self._write_scratch
+        if len(scratch) < bytestosend + frame_count:
+            scratch = self._write_scratch = bytearray(bytestosend + frame_count)
+        scratch_view = memoryview(scratch)
+        frames = []
         offset = 0
+        position = 0
         while bytestosend > 0:
-            transfer_bytes = min(bytestosend, self.connection.max_transfer_size)
-            senddata = bytearray(transfer_bytes+1)
-            senddata[0] = self.Command.WRITE_MEMORY
-            senddata[1:] = data[offset: offset+transfer_bytes]
-            self.write(senddata)
+            transfer_bytes = min(bytestosend, max_transfer_size)
+            scratch[position] = self._WRITE_MEMORY
+            payload_end = position + 1 + transfer_bytes
+            scratch[position + 1:payload_end] = data[offset:offset + transfer_bytes]
+            frames.append(scratch_view[position:payload_end])
+            position += transfer_bytes + 1
             offset += transfer_bytes
             bytestosend -= transfer_bytes
+        self.connection.write_many(frames)
 
         ack, msg = self.connection.readnewint()
-        if (ack != self.Reply.ACK):
+        if (ack != self._ACK):
             self.debug(0, "Programming failed")
 
     def erase_memory(self, pages=None):
@@ -691,8 +882,8 @@ class Stm32Bootloader:
                     "Set pages to None to do global erase or supply fewer pages."
                 )
             page_count = len(pages) - 1
-            page_numbers = bytearray(pages)
-            checksum = reduce(operator.xor, page_numbers, page_count)
+            page_numbers = bytes(pages)
+            checksum = _xor_checksum(page_numbers, page_count)
             self.write(page_count, page_numbers, checksum)
         else:
             # global erase: n=255 (page count)
@@ -712,23 +903,42 @@ class Stm32Bootloader:
         :param iterable pages: Iterable of integer page addresses, zero-based.
           Set to None to trigger global mass erase.
         """
-        cmd = struct.pack(">bH", self.Command.EXTENDED_ERASE, self.EraseBank.ALL)
+        if pages:
+            # The command carries the page count - 1, the page numbers follow.
+            if len(pages) > 0xFFF0:
+                raise PageIndexError("Can not erase more than 65520 pages at once.")
+            page_count = len(pages) - 1
+        else:
+            page_count = self.EraseBank.ALL
+        cmd = self._EXTENDED_ERASE_COMMAND.pack(self.Command.EXTENDED_ERASE, page_count)
         self.command(cmd, "Erase memory")
 
+        if pages:
+            # Two-byte big-endian page numbers, as many per frame as fit.
+            page_numbers = struct.pack(">%dH" % len(pages), *pages)
+            frame_size = self.connection.max_transfer_size
+            self.connection.write_many(
+                [
+                    bytes([self.Command.EXTENDED_ERASE])
+                    + page_numbers[offset:offset + frame_size]
+                    for offset in range(0, len(page_numbers), frame_size)
+                ]
+            )
+
         ack, msg = self.connection.readnewint()
         info = "erase command"
         if ack == self.Reply.NACK:
             raise CommandError("NACK " + info)
         if ack != self.Reply.ACK:
-            raise CommandError("Unknown response. " + info + ": " + hex(reply))
+            raise CommandError("Unknown response. " + info + ": " + hex(ack))
         self.debug(10, "    Extended Erase memory done")
 
     def write_protect(self, pages):
         """Enable write protection on the given flash pages."""
         self.command(self.Command.WRITE_PROTECT, "Write protect")
         nr_of_pages = (len(pages) - 1) & 0xFF
-        page_numbers = bytearray(pages)
-        checksum = reduce(operator.xor, page_numbers, nr_of_pages)
+        page_numbers = bytes(pages)
+        checksum = _xor_checksum(page_numbers, nr_of_pages)
         self.write_and_ack("0x63 write protect failed", nr_of_pages, page_numbers, checksum)
         self.debug(10, "    Write protect done")
 
@@ -759,37 +969,74 @@ class Stm32Bootloader:
             time.sleep(20)
             self.debug(20, "    Unprotect / mass erase done")
         else:
-            self.debug("Readout unprotect failed")
+            self.debug(0, "Readout unprotect failed")
 
-    def read_memory_data(self, address, length):
+    def read_memory_data(self, address, length, out_file=None):
         """
         Return flash content from the given address and byte count.
 
         Length may be more than 256 bytes.
+        If out_file is given, each chunk is written to that binary file
+        as soon as it is read, and None is returned instead.
         """
-
-        data = bytearray()
-        chunk_count = int(math.ceil(length / float(self.data_transfer_size)))
-        self.debug(10, "Read %7d bytes in %3d chunks at address 0x%X..." % (length, chunk_count, address))
+        if self._read_cache is not None and out_file is None:
+            return bytearray(self._cached_read_memory_data(address, length))
+        return self._read_memory_data(address, length, out_file)
+
+    def _read_memory_data(self, address, length, out_file=None):
+        """Read flash content, skipping the cache; see read_memory_data()."""
+        chunks = []
+        chunk_count = -(-length // self.data_transfer_size)
+        self.debug(
+            10, "Read %7d bytes in %3d chunks at address 0x%X...", length, chunk_count, address
+        )
         with self.show_progress("Reading", maximum=chunk_count) as progress_bar:
             while length:
                 read_length = min(length, self.data_transfer_size)
-                data = data + self.read_memory(address, read_length)
+                chunk = self.read_memory(address, read_length)
+                if out_file is None:
+                    chunks.append(chunk)
+                else:
+                    out_file.write(chunk)
                 progress_bar.next()
                 length = length - read_length
                 address = address + read_length
+        return bytearray().join(chunks) if out_file is None else None
+
+    def _cached_read_memory_data(self, address, length):
+        """Return data from the read cache; read and cache it on a miss."""
+        key = (address, length)
+        data = self._read_cache.get(key)
+        if data is not None:
+            self._read_cache.move_to_end(key)
+            return data
+
+        if length <= self.data_transfer_size:
+            # A single transfer; no need for a progress bar.
+            data = self.read_memory(address, length)
+        else:
+            data = self._read_memory_data(address, length)
+        if len(data) <= self.READ_CACHE_SIZE:
+            self._read_cache[key] = data
+            self._read_cache_bytes += len(data)
+            while self._read_cache_bytes > self.READ_CACHE_SIZE:
+                _key, evicted = self._read_cache.popitem(last=False)
+                self._read_cache_bytes -= len(evicted)
         return data
 
     def write_memory_data(self, address, data):
         """
         Write the given data to flash.
 
+        Data can be any bytes-like object, e.g. a memoryview.
         Data length may be more than 256 bytes.
         """
         length = len(data)
-        chunk_count = int(math.ceil(length / float(self.data_transfer_size)))
+        chunk_count = -(-length // self.data_transfer_size)
         offset = 0
-        self.debug(20, "Write %6d bytes in %3d chunks at address 0x%X..." % (length, chunk_count, address))
+        self.debug(
+            20, "Write %6d bytes in %3d chunks at address 0x%X...", length, chunk_count, address
+        )
 
         with self.show_progress("Writing", maximum=chunk_count) as progress_bar:
             while length:
@@ -800,6 +1047,55 @@ class Stm32Bootloader:
                 offset += write_length
                 address += write_length
 
+    def get_checksum(self, address, length):
+        """
+        Return the CRC that the MCU computes over the given flash range.
+
+        Length should be a multiple of 4 bytes.
+        """
+        if length % 4 != 0:
+            raise DataLengthError("Checksum length should be a multiple of 4 bytes.")
+
+        cmd = self._CHECKSUM_COMMAND.pack(self.Command.GET_CHECKSUM, address, length // 4)
+        self.command(cmd, "Get checksum")
+
+        crc, msg = self.connection.readnewint()
+        ack, msg = self.connection.readnewint()
+        if crc is None or ack != self.Reply.ACK:
+            raise CommandError("Get checksum failed: %7d bytes address 0x%X" % (length, address))
+        return crc
+
+    def verify_checksum(self, address, reference_data):
+        """
+        Raise an error if the flash CRC does not match the reference data.
+
+        This needs a single command instead of reading back all of
+        the data.  Error type is DataMismatchError.
+        """
+        # Flash is written in words, padded with 0xFF.
+        padding = b"\xff" * (-len(reference_data) % 4)
+        expected_crc = self.crc32(bytes(reference_data) + padding)
+        device_crc = self.get_checksum(address, len(reference_data) + len(padding))
+        if device_crc != expected_crc:
+            raise DataMismatchError(
+                "Checksum does not match: 0x%08X read vs 0x%08X expected."
+                % (device_crc, expected_crc)
+            )
+
+    @staticmethod
+    def crc32(data):
+        """
+        Return the CRC of data as computed by the STM32 CRC unit.
+
+        That is CRC-32/MPEG-2, fed with little-endian 32-bit words.
+        Data length should be a multiple of 4 bytes.
+        """
+        # Feed the bytes of each word most significant byte first.
+        words = bytearray(len(data))
+        for index in range(4):
+            words[index::4] = data[3 - index::4]
+        return _crc32_mpeg2(words)
+
     @staticmethod
     def verify_data(read_data, reference_data):
         """
@@ -821,17 +1117,27 @@ class Stm32Bootloader:
             )
 
         # data differs; find out where and raise VerifyError
-        for address, data_pair in enumerate(zip(reference_data, read_data)):
-            reference_byte, read_byte = data_pair
+        # Compare whole blocks first, so that only the first differing
+        # block is scanned byte by byte.
+        read_view = memoryview(read_data)
+        reference_view = memoryview(reference_data)
+        block_start = 0
+        block_end = _VERIFY_BLOCK
+        while read_view[block_start:block_end] == reference_view[block_start:block_end]:
+            block_start = block_end
+            block_end = block_start + _VERIFY_BLOCK
+        for address in range(block_start, block_end):
+            read_byte = read_view[address]
+            reference_byte = reference_view[address]
             if reference_byte != read_byte:
                 raise DataMismatchError(
                     "Verification data does not match read data. "
                     "First mismatch at address: 0x%X read 0x%X vs 0x%X expected."
-                    % (address, bytearray([read_byte])[0], bytearray([reference_byte])[0])
+                    % (address, read_byte, reference_byte)
                 )
 
     def pages_from_range(self, start, end):
-        """Return page indices for the given memory range."""
+        """Return page indices for the given memory range, as a range."""
         if start % self.flash_page_size != 0:
             raise PageIndexError(
                 f"Erase start address should be at a flash page boundary: 0x{start:08X}."
@@ -841,43 +1147,40 @@ class Stm32Bootloader:
                 f"Erase end address should be at a flash page boundary: 0x{end:08X}."
             )
 
-        # Assemble the list of pages to erase.
         first_page = start // self.flash_page_size
         last_page = end // self.flash_page_size
-        pages = list(range(first_page, last_page))
-
-        return pages
+        return range(first_page, last_page)
 
     def _wait_for_ack(self, info=""):
-        """Read a byte and raise CommandError if it's not ACK."""
+        """
+        Read a reply and raise CommandError if it's not ACK.
+
+        A NACK is retried up to five times before giving up.
+        """
+        read_reply = self.connection.readnewint
+        nack = self.Reply.NACK
         retries = 5
         while retries > 0:
             retries -= 1
 
-            ack, msg = self.connection.readnewint()    
-            if ack == self.Reply.NACK:
+            ack, msg = read_reply()
+            if ack == nack:
                 print("retry " + info)
             else:
                 break
 
         if ack is None:
             raise CommandError("Can't read port or timeout")
-
-        ack, msg = self.connection.readnewint()
-        return (ack == self.Reply.ACK)
-
-        if reply == self.Reply.NACK:
+        if ack == self.Reply.NACK:
             raise CommandError("NACK " + info)
-        if reply != self.Reply.ACK:
-            raise CommandError("Unknown response. " + info + ": " + hex(reply))
+        if ack != self.Reply.ACK:
+            raise CommandError("Unknown response. " + info + ": " + hex(ack))
 
-        return 1
+        return True
 
     @staticmethod
     def _encode_address(address):
         """Return the given address as big-endian bytes with a checksum."""
-        # address in four bytes, big-endian
-        address_bytes = bytearray(struct.pack(">I", address))
-        # checksum as single byte
-        checksum_byte = struct.pack("B", reduce(operator.xor, address_bytes))
-        return address_bytes + checksum_byte
+        # address in four bytes, big-endian, then the XOR of those bytes
+        checksum = (address >> 24) ^ (address >> 16) ^ (address >> 8) ^ address
+        return Stm32Bootloader._ADDRESS.pack(address, checksum & 0xFF)
@@ -11,26 +11,76 @@ This does not offer support for toggling RESET and BOOT0.
 """
 
 
-import can
+import socket
+import subprocess
+import sys
 import time
 
+import can
+
 filters = None # pass everything
 #[
 #    {"can_id": 0x0, "can_mask": 0x7FF, "extended": False},
 #    {"can_id": 0x088, "can_mask": 0x7ff, "extended": False},
 #]
 
+# Fields in the 22 used bits of an extended arbitration ID.
+_PRIORITY_SHIFT, _PRIORITY_MASK = 20, 0x3
+_BOARD_ID_SHIFT, _BOARD_ID_MASK = 16, 0xF
+_COMMAND_ID_SHIFT, _COMMAND_ID_MASK = 9, 0x7F
+_REQUEST_ID_SHIFT, _REQUEST_ID_MASK = 1, 0xFF
+_ERROR_FLAG_MASK = 0x1
 
-class CANConnection:
+# Most frames flush_input_buffer() discards, so a busy bus can't keep it busy.
+_FLUSH_MAX_FRAMES = 1024
+
+# Connections left open for reuse, by channel. See get_connection().
+_connection_cache = {}
+
+
+def get_connection(channel, **kwargs):
+    """
+    Return a connected CANConnection for the channel.
+
+    An earlier connection to the same channel is reused if it is still
+    alive. The keyword arguments are passed to CANConnection; they only
+    take effect when a new connection is made.
+    """
+    connection = _connection_cache.get(channel)
+    if connection is None or not connection.is_alive():
+        connection = CANConnection(channel, **kwargs)
+        connection.connect()
+        _connection_cache[channel] = connection
+    return connection
 
 
-    def __init__(self, channel, interface = 'socketcan'):
+class CANConnection:
+
+    def __init__(
+        self,
+        channel,
+        interface='socketcan',
+        txqueuelen=None,
+        sndbuf=None,
+        bitrate=None,
+        data_bitrate=None,
+    ):
         self.bus = None
+        # Bound bus.send and bus.recv, set by connect().
+        self._send = None
+        self._recv = None
         self._timeout = 1.0 # seconds
         self._channel = channel
         self._interface = interface
+        self._txqueuelen = txqueuelen
+        self._sndbuf = sndbuf
+        self._bitrate = bitrate
+        self._data_bitrate = data_bitrate
         self.message = None
         self.max_transfer_size = 64
+        # Reused for every transmitted frame: send() serializes the
+        # message right away, so there is no need for one per frame.
+        self._tx_message = can.Message(is_extended_id=False, is_fd=True, bitrate_switch=True)
 
     @property
     def timeout(self):
@@ -44,59 +94,121 @@ class CANConnection:
 
 
     def connect(self):
+        if self._bitrate:
+            self._configure_bitrate()
         self.bus = can.interface.Bus(self._channel,
                                      self._interface,
                                      can_filters=filters,
                                      fd=True, 
                                      err_reporting=True,
                                      receive_own_messages=False, local_loopback=False)   
-
+        self._send = self.bus.send
+        self._recv = self.bus.recv
+        # Larger kernel queues absorb bursts of frames, so that
+        # write_many() does not block on a full transmit queue.
+        if self._txqueuelen:
+            self._ip_link_set("txqueuelen", str(self._txqueuelen))
+        if self._sndbuf:
+            self._set_socket_buffers(self._sndbuf)
+
+    def _configure_bitrate(self):
+        """Restart the CAN interface with the configured (data) bitrate."""
+        settings = ["type", "can", "bitrate", str(self._bitrate)]
+        if self._data_bitrate:
+            # 64-byte CAN FD frames, with the payload at the data bitrate.
+            settings += ["dbitrate", str(self._data_bitrate), "fd", "on"]
+        self._ip_link_set("down")
+        self._ip_link_set(*settings)
+        self._ip_link_set("up")
+
+    def _ip_link_set(self, *settings):
+        """Configure the CAN interface with iproute2; this needs root."""
+        command = ["ip", "link", "set", self._channel, *settings]
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Could not run '{' '.join(command)}': {e}", file=sys.stderr)
+
+    def _set_socket_buffers(self, size):
+        """Set the send and receive buffer size of the SocketCAN socket."""
+        sock = getattr(self.bus, "socket", None)
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+        except OSError as e:
+            print(f"Could not set socket buffer size: {e}", file=sys.stderr)
+
+    def is_alive(self):
+        """Return True if the bus is open and its socket reports no error."""
+        if self.bus is None:
+            return False
+        sock = getattr(self.bus, "socket", None)
+        if sock is None:
+            return True
+        try:
+            return sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+        except OSError:
+            return False
 
     def disconnect(self):
+        if _connection_cache.get(self._channel) is self:
+            del _connection_cache[self._channel]
         if self.bus:
             self.bus.shutdown()
         self.bus = None
+        self._send = None
+        self._recv = None
 
     def write(self, *args, **kwargs):
-        """Write the given data to the CAN connection."""
-        msg = can.Message(arbitration_id=args[0][0], data=args[0][1:], is_extended_id=False, is_fd=True, check=True, bitrate_switch = True)
-        return  self.bus.send(msg, timeout=self._timeout)
+        """
+        Write the given data to the CAN connection.
+
+        The first byte is the arbitration ID, the rest is the payload.
+        """
+        frame = memoryview(args[0])
+        if len(frame) > self.max_transfer_size + 1:
+            raise ValueError("CAN FD frame payload too long: %d bytes" % (len(frame) - 1))
+        msg = self._tx_message
+        msg.arbitration_id = frame[0]
+        # Slicing the view does not copy; bytes() copies the payload once.
+        msg.data = bytes(frame[1:])
+        msg.dlc = len(msg.data)
+        return self._send(msg, timeout=self._timeout)
+
+    def write_many(self, frames):
+        """Write the given frames back-to-back, without reading in between."""
+        for frame in frames:
+            self.write(frame)
 
 
     def headerbody(self, message):
         if message is None:
             return None, None
         header = '{0:f} {1:x} {2:x} {3:x} {4:x} '.format(message.timestamp, message.is_fd,message.bitrate_switch,message.arbitration_id, message.dlc)
-        body=''
-        for i in range(message.dlc ):
-            body +=  '{0:x} '.format(message.data[i])
-        return header, body 
+        body = memoryview(message.data)[:message.dlc].hex(" ")
+        return header, body
 
     def readnewint(self):
-        msg = self.bus.recv(self.timeout) 
+        """Receive a frame; return (payload as big-endian int, frame)."""
+        msg = self._recv(self._timeout)
         self.message = msg
 
-        if msg is not None:        
-            header,body = self.headerbody(msg)
-            bodybytes = body.split()
-        
-            result = 0
-            for b in bodybytes:
-                result = (result << 8) + int(b,16)
-            return result, msg
+        if msg is not None:
+            # A view of the payload, so that it is not copied first.
+            return int.from_bytes(memoryview(msg.data)[:msg.dlc], "big"), msg
         return None, msg
     
 
     def read(self, *args, **kwargs):
-        """Read the given amount of bytes from the serial connection."""
-        self.message = self.bus.recv(self.timeout) 
-        header, body = self.headerbody(self.message)
-        bodybytes = body.split()
-
-        result = bytearray()
-        for b in bodybytes:
-            result.append(int(b,16))
-        return result, self.message
+        """Receive a frame; return its payload bytes, and the frame."""
+        msg = self._recv(self._timeout)
+        self.message = msg
+
+        if msg is not None:
+            return bytearray(memoryview(msg.data)[:msg.dlc]), msg
+        return None, msg
     
     def flush(self):
         for msg in self.bus:
@@ -108,18 +220,23 @@ class CANConnection:
         return None
 
     def flush_input_buffer(self):
-        message = self.bus.recv(1.0) # Timeout in seconds.
-        return message
+        """
+        Discard the frames received so far, without waiting for more.
+
+        Stops after _FLUSH_MAX_FRAMES frames, even if more keep arriving.
+        """
+        recv = self._recv
+        for _ in range(_FLUSH_MAX_FRAMES):
+            if recv(0.0) is None:
+                break
 
     def from_can_msg(self, msg: can.Message):
-        # Currently 22 out of 29 bits of the extended arbitration_id are used.
-        # Padding to 22 bits makes sure that priority=0 is parsed correctly.
-        #
-        # If number of bits is increased, priority will always parse the first two bits.
-        b = f"{msg.arbitration_id:022b}"
-        priority = int(b[0:2], 2)
-        board_id = int(b[2:6], 2)
-        command_id = int(b[6:13], 2)
-        request_id = int(b[13:21], 2)
-        error_flag = bool(int(b[21]))
+        # Split the 22 used ID bits into fields;
+        # see the _*_SHIFT and _*_MASK constants.
+        arbitration_id = msg.arbitration_id
+        priority = (arbitration_id >> _PRIORITY_SHIFT) & _PRIORITY_MASK
+        board_id = (arbitration_id >> _BOARD_ID_SHIFT) & _BOARD_ID_MASK
+        command_id = (arbitration_id >> _COMMAND_ID_SHIFT) & _COMMAND_ID_MASK
+        request_id = (arbitration_id >> _REQUEST_ID_SHIFT) & _REQUEST_ID_MASK
+        error_flag = (arbitration_id & _ERROR_FLAG_MASK) != 0
         return priority, board_id, command_id, request_id, error_flag
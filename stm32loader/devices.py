@@ -1,8 +1,27 @@
+from __future__ import annotations
+
 import enum
+from typing import NamedTuple, Optional, Tuple, Union
+
+__all__ = (
+    "BootloaderSerialPeripherals",
+    "DEVICE_DETAILS",
+    "DEVICE_FAMILIES",
+    "DEVICES",
+    "DEVICES_BY_PID",
+    "DeviceFamily",
+    "DeviceFamilyInfo",
+    "DeviceFlag",
+    "DeviceInfo",
+    "Flash",
+    "lookup",
+)
 
 
 @enum.unique
-class DeviceFamily(enum.Enum):
+class DeviceFamily(str, enum.Enum):
+    # Members compare and hash equal to their name strings,
+    # so they can be used as DEVICE_FAMILIES keys as well.
     # AN2606
     C0 = "C0"
     F0 = "F0"
@@ -31,8 +50,8 @@ class DeviceFamily(enum.Enum):
     WIZ = "WIZ"
 
 
-@enum.unique
-class DeviceFlag(enum.IntEnum):
+class DeviceFlag:
+    # Plain int bit flags, combined with | and tested with &.
     NONE = 0
     OBL_LAUNCH = 1
     CLEAR_PEMPTY = 2
@@ -40,12 +59,24 @@ class DeviceFlag(enum.IntEnum):
     # bytes for UID and flash size directly.
     # Reading a whole chunk of 256 bytes at 0x1FFFA700 does work and
     # requires some data extraction.
-    LONG_UID_ACCESS = 8,
+    LONG_UID_ACCESS = 8
     FORCE_PARITY_NONE = 16
 
 
 class DeviceFamilyInfo:
 
+    __slots__ = (
+        "name",
+        "uid_address",
+        "flash_size_address",
+        "flash_page_size",
+        "transfer_size",
+        "mass_erase",
+        "option_bytes",
+        "bootloader_id_address",
+        "family_default_flags",
+    )
+
     def __init__(
             self,
             name,
@@ -70,37 +101,37 @@ class DeviceFamilyInfo:
 
 
 DEVICE_FAMILIES = {
-    DeviceFamily.C0: DeviceFamilyInfo("C0", bootloader_id_address=0x_1FFF_17FE),
+    "C0": DeviceFamilyInfo("C0", bootloader_id_address=0x_1FFF_17FE),
     # RM0360
-    DeviceFamily.F0: DeviceFamilyInfo("F0", flash_size_address=0x_1FFF_F7CC, option_bytes=(0x_1FFF_F800, 0x_1FFF_F80F)),
+    "F0": DeviceFamilyInfo("F0", flash_size_address=0x_1FFF_F7CC, option_bytes=(0x_1FFF_F800, 0x_1FFF_F80F)),
     # RM0008
-    DeviceFamily.F1: DeviceFamilyInfo("F1", uid_address=0x_1FFF_F7E8, flash_size_address=0x_1FFF_F7E0, option_bytes=(0x_1FFF_F800, 0x_1FFF_F80F)),
-    DeviceFamily.F2: DeviceFamilyInfo("F2", option_bytes=(0x_1FFF_C000, 0x_1FFF_C00F), bootloader_id_address=0x_1FFF_77DE),
+    "F1": DeviceFamilyInfo("F1", uid_address=0x_1FFF_F7E8, flash_size_address=0x_1FFF_F7E0, option_bytes=(0x_1FFF_F800, 0x_1FFF_F80F)),
+    "F2": DeviceFamilyInfo("F2", option_bytes=(0x_1FFF_C000, 0x_1FFF_C00F), bootloader_id_address=0x_1FFF_77DE),
     # RM0366, RM0365, RM0316, RM0313, RM4510
-    DeviceFamily.F3: DeviceFamilyInfo("F3", uid_address=0x_1FFF_F7AC, flash_size_address=0x_1FFF_F7CC, flash_page_size=2048, bootloader_id_address=0x_1FFF_F796),
+    "F3": DeviceFamilyInfo("F3", uid_address=0x_1FFF_F7AC, flash_size_address=0x_1FFF_F7CC, flash_page_size=2048, bootloader_id_address=0x_1FFF_F796),
     # RM0090
-    DeviceFamily.F4: DeviceFamilyInfo("F4", uid_address=0x_1FFF_7A10, flash_size_address=0x_1FFF_7A22, bootloader_id_address=0x_1FFF_76DE, flags=DeviceFlag.LONG_UID_ACCESS),
+    "F4": DeviceFamilyInfo("F4", uid_address=0x_1FFF_7A10, flash_size_address=0x_1FFF_7A22, bootloader_id_address=0x_1FFF_76DE, flags=DeviceFlag.LONG_UID_ACCESS),
     # RM0385
-    DeviceFamily.F7: DeviceFamilyInfo("F7", uid_address=0x_1FF0_F420, flash_size_address=0x_1FF0_F442, bootloader_id_address=0x_1FF0_EDBE),
+    "F7": DeviceFamilyInfo("F7", uid_address=0x_1FF0_F420, flash_size_address=0x_1FF0_F442, bootloader_id_address=0x_1FF0_EDBE),
     # RM0444
-    DeviceFamily.G0: DeviceFamilyInfo("G0", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0),
-    DeviceFamily.G4: DeviceFamilyInfo("G4", bootloader_id_address=0x_1FFF_6FFE),
-    DeviceFamily.H5: DeviceFamilyInfo("H5", ),
+    "G0": DeviceFamilyInfo("G0", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0),
+    "G4": DeviceFamilyInfo("G4", bootloader_id_address=0x_1FFF_6FFE),
+    "H5": DeviceFamilyInfo("H5", ),
     # RM0433
-    DeviceFamily.H7: DeviceFamilyInfo("H7", uid_address=0x_1FF1_E800, flash_size_address=0x_1FF1_E880, flash_page_size=128 * 1024),
+    "H7": DeviceFamilyInfo("H7", uid_address=0x_1FF1_E800, flash_size_address=0x_1FF1_E880, flash_page_size=128 * 1024),
     # FIXME TWO RMs?
     # RM0451, RM4510
-    DeviceFamily.L0: DeviceFamilyInfo("L0", uid_address=0x_1FF8_0050, flash_size_address=0x_1FF8_007C, transfer_size=128, flash_page_size=128, mass_erase=False, flags=DeviceFlag.LONG_UID_ACCESS),
-    DeviceFamily.L1: DeviceFamilyInfo("L1", mass_erase=False),
+    "L0": DeviceFamilyInfo("L0", uid_address=0x_1FF8_0050, flash_size_address=0x_1FF8_007C, transfer_size=128, flash_page_size=128, mass_erase=False, flags=DeviceFlag.LONG_UID_ACCESS),
+    "L1": DeviceFamilyInfo("L1", mass_erase=False),
     # RM0394
-    DeviceFamily.L4: DeviceFamilyInfo("L4", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0, bootloader_id_address=0x_1FFF_6FFE),
-    DeviceFamily.L5: DeviceFamilyInfo("L5", ),
-    DeviceFamily.WBA: DeviceFamilyInfo("WBA", ),
-    DeviceFamily.WB: DeviceFamilyInfo("WB", ),
+    "L4": DeviceFamilyInfo("L4", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0, bootloader_id_address=0x_1FFF_6FFE),
+    "L5": DeviceFamilyInfo("L5", ),
+    "WBA": DeviceFamilyInfo("WBA", ),
+    "WB": DeviceFamilyInfo("WB", ),
     # RM0453
-    DeviceFamily.WL: DeviceFamilyInfo("WL", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0),
-    DeviceFamily.U5: DeviceFamilyInfo("U5", ),
-    DeviceFamily.W: DeviceFamilyInfo("W", ),
+    "WL": DeviceFamilyInfo("WL", uid_address=0x_1FFF_7590, flash_size_address=0x_1FFF_75E0),
+    "U5": DeviceFamilyInfo("U5", ),
+    "W": DeviceFamilyInfo("W", ),
     # ST BlueNRG series; see ST AN4872 (BlueNRG-1/2) and AN5471 (BlueNRG-LP/LPS). BlueNRG requires parity 'none'.
     #   Product ID:
     #       Byte 1: metal fix (masked out)
@@ -111,16 +142,18 @@ DEVICE_FAMILIES = {
     #   There is no access to peripherals/system memory from bootloader, so flash size and UID can not be read
     #       NRG-1/2: flash_size_address=0x_4010_0014, uid_address=0x_1000_07F4
     #       NRG-LP:  flash_size_address=0x_4000_1014, uid_address=0x_1000_1EF0
-    DeviceFamily.NRG: DeviceFamilyInfo("NRG", flags=DeviceFlag.FORCE_PARITY_NONE, flash_page_size=2048),
-    DeviceFamily.WIZ: DeviceFamilyInfo("WIZ", ),
+    "NRG": DeviceFamilyInfo("NRG", flags=DeviceFlag.FORCE_PARITY_NONE, flash_page_size=2048),
+    "WIZ": DeviceFamilyInfo("WIZ", ),
 }
 
 
 kB = 1024
 
 
-class Flash:
+class Flash(NamedTuple):
 
+    # Sector size layouts. Every device row refers to one of these
+    # tuples, so each layout exists only once.
     # RM0090 4 sectors of 16 Kbytes, 1 sector of 64 Kbytes, 7 sectors of 128 Kbytes
     F2_F4_PAGE_SIZE = (16 * kB, 16 * kB, 16 * kB, 16 * kB, 64 * kB, 128 * kB, 0)
     # RM0090 4 sectors of 16 Kbytes, 1 sector of 64 Kbytes, 7 sectors of 128 Kbytes... per bank
@@ -130,11 +163,11 @@ class Flash:
     )
     F7_PAGE_SIZE = (32 * kB, 32 * kB, 32 * kB, 32 * kB, 128 * kB, 256 * kB, 0)
 
-    def __init__(self, start=None, end=None, page_size=None, pages_per_sector=None):
-        self.start = start
-        self.end = end
-        self.page_size = page_size
-        self.pages_per_sector = pages_per_sector
+    start: Optional[int] = None
+    end: Optional[int] = None
+    # A single page size, or a sector size layout.
+    page_size: Union[int, Tuple[int, ...], None] = None
+    pages_per_sector: Optional[int] = None
 
     @property
     def size(self):
@@ -144,78 +177,82 @@ class Flash:
         return self.end - self.start
 
 
+def _range_size(memory_range):
+    """Return the size of a (start, end) range.
+
+    For a tuple of ranges, return the sum of their sizes.
+    """
+    if memory_range is None:
+        return 0
+
+    if isinstance(memory_range[0], tuple):
+        # Multiple ranges.
+        return sum(end - start for start, end in memory_range)
+
+    start, end = memory_range
+    return end - start
+
+
 class DeviceInfo:
 
+    __slots__ = (
+        "family",
+        "device_name",
+        "product_id",
+        "bootloader_id",
+        "variant",
+        "product_line",
+        "ram",
+        "flash",
+        "system_memory",
+        "option_bytes",
+        "flags",
+        "bootloader_id_address",
+        "_ram_size",
+        "_flash_size",
+        "_system_memory_size",
+    )
+
     def __init__(self, device_family, device_name, pid, bid, variant=None, line=None, ram=None, flash=None, system=None, option=None, bootloader_id_address=None, flags=DeviceFlag.NONE):
-        self.family = DEVICE_FAMILIES[DeviceFamily[device_family]]
+        self.family = DEVICE_FAMILIES[device_family]
         self.device_name = device_name
         self.product_id = pid
         self.bootloader_id = bid
         self.variant = variant
         self.product_line = line
         self.ram = ram
-        self.flash = Flash(*(flash or []))
+        self.flash = Flash() if flash is None else Flash(*flash)
         self.system_memory = system
         self.option_bytes = option
         self.flags = flags | self.family.family_default_flags
         self.bootloader_id_address = bootloader_id_address or self.family.bootloader_id_address
+        # The ranges don't change, so their sizes are computed once.
+        self._ram_size = _range_size(ram)
+        self._flash_size = self.flash.size
+        self._system_memory_size = _range_size(system)
 
     @property
     def ram_size(self):
-        if self.ram is None:
-            return 0
-
-        assert isinstance(self.ram, tuple)
-
-        if isinstance(self.ram[0], tuple):
-            # Multiple ranges.
-            ram_size = 0
-            for ram_range in self.ram:
-                ram_size += ram_range[1] - ram_range[0]
-
-            return ram_size
-
-        start, end = self.ram
-        ram_size = end - start
-        return ram_size
+        return self._ram_size
 
     @property
     def flash_size(self):
-        return self.flash.size
+        return self._flash_size
 
     @property
     def system_memory_size(self):
-        if self.system_memory is None:
-            return 0
-
-        assert isinstance(self.system_memory, tuple)
-
-        if isinstance(self.system_memory[0], tuple):
-            # Multiple ranges.
-            flash_size = 0
-            for flash_range in self.system_memory:
-                flash_size += flash_range[1] - flash_range[0]
-
-            return flash_size
-
-        start, end = self.system_memory
-        flash_size = end - start
-        return flash_size
+        return self._system_memory_size
 
     def __str__(self):
-        name = self.device_name
-        if self.variant:
-            name += f"-{self.variant}"
-        if self.product_line:
-            name += f"-{self.product_line}"
-        return name
+        variant = f"-{self.variant}" if self.variant else ""
+        product_line = f"-{self.product_line}" if self.product_line else ""
+        return f"{self.device_name}{variant}{product_line}"
 
     def __repr__(self):
         return f"DeviceInfo(device_name={self.device_name!r}, variant={self.product_line!r})"
 
 
-@enum.unique
-class BootloaderSerialPeripherals(enum.Enum):
+class BootloaderSerialPeripherals:
     # AN2606
     USART = 1
     DUAL_USART = 2
@@ -381,3 +418,28 @@ for device in DEVICE_DETAILS:
     if (device.product_id, None) in DEVICES:
         continue
     DEVICES[(device.product_id, None)] = device
+
+
+def _index_by_pid(devices):
+    """Return the (product ID, bootloader ID) mapping as nested dicts."""
+    by_pid = {}
+    for (product_id, bootloader_id), device_info in devices.items():
+        by_pid.setdefault(product_id, {})[bootloader_id] = device_info
+    return by_pid
+
+
+# The same devices, by product ID and then by bootloader ID.
+DEVICES_BY_PID = _index_by_pid(DEVICES)
+
+
+def lookup(product_id, bootloader_id=None):
+    """
+    Return the DeviceInfo for the product ID and bootloader ID.
+
+    Fall back to the product ID's generic entry when the bootloader ID
+    is unknown or None; return None when the product ID is unknown.
+    """
+    candidates = DEVICES_BY_PID.get(product_id)
+    if candidates is None:
+        return None
+    return candidates.get(bootloader_id) or candidates[None]
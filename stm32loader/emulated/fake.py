@@ -109,6 +109,10 @@ class FakeConnection:
         # Send to coroutine.
         self.receiver.send(data)
 
+    def write_many(self, frames):
+        for frame in frames:
+            self.write(frame)
+
     def read(self, length=1):
         if self.next_return:
             value = self.next_return.pop(0)
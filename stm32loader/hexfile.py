@@ -21,10 +21,10 @@ def load_hex(file_path: str) -> bytes:
 
     hex_content = intelhex.IntelHex()
     hex_content.loadhex(str(file_path))
-    hex_dict = hex_content.todict()
 
-    addresses = list(hex_dict.keys())
-    assert addresses[0] == 0
-    assert addresses[-1] == len(addresses) - 1
+    # With contiguous addresses, the image can be dumped in one go
+    # instead of walking a per-byte dict (twice).
+    assert hex_content.minaddr() == 0
+    assert hex_content.maxaddr() == len(hex_content) - 1
 
-    return bytes(hex_content.todict().values())
+    return hex_content.tobinstr()
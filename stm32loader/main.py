@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+
+# With significant modifications for FDCAN, this code 
+# is derived from 
+# GitHub repository: https://github.com/florisla/stm32loader
+#
+# This file is part of stm32loader.
+#
+# stm32loader is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 3, or (at your option) any later
+# version.
+#
+# stm32loader is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with stm32loader; see the file LICENSE.  If not see
+# <http://www.gnu.org/licenses/>.
+
+"""Flash firmware to STM32 microcontrollers over an FDCAN connection."""
+
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from stm32loader import args
+from stm32loader import hexfile
+from stm32loader import bootloader
+from stm32loader.devices import DEVICE_FAMILIES, DeviceFlag, DeviceFamily
+from stm32loader import canconnection
+
+# Permissions of a newly created read-out file.
+_READ_FILE_MODE = 0o644
+
+
+class Stm32Loader:
+    """Main application: parse arguments and handle commands."""
+
+    def __init__(self):
+        """Construct Stm32Loader object with default settings."""
+        self.stm32 = None
+        self.configuration = args.Configuration()
+        self._data_file_loading = None
+
+    def debug(self, level, message, *fmt_args):
+        """
+        Log a message if its level is low enough.
+
+        Any fmt_args are %-formatted into the message only when it is printed.
+        """
+        if self.configuration.verbosity >= level:
+            print(message % fmt_args if fmt_args else message)
+
+    def parse_arguments(self, arguments):
+        """Parse the list of command-line arguments."""
+        self.configuration = args.parse_arguments(arguments)
+
+    def start_loading_data_file(self):
+        """
+        Start loading the data file in the background.
+
+        This way, reading and parsing a large (hex) file overlaps with
+        connecting to and detecting the device. perform_commands()
+        waits for the result before erasing, so a broken file is still
+        reported before flash is touched.
+        """
+        if not (self.configuration.write or self.configuration.verify):
+            return
+        executor = ThreadPoolExecutor(max_workers=1)
+        self._data_file_loading = executor.submit(
+            self._load_data_file, Path(self.configuration.data_file)
+        )
+        executor.shutdown(wait=False)
+
+    def disconnect(self, force=False):
+        """
+        Close the connection to the bootloader.
+
+        With --keep-connection, the connection is left open for reuse
+        unless force is True.
+        """
+        if self.stm32 is None:
+            return
+        if self.configuration.keep_connection and not force:
+            return
+        self.stm32.connection.disconnect()
+
+    def connect(self):
+        """Connect to the bootloader via FDCAN."""
+        settings = {
+            "txqueuelen": self.configuration.txqueuelen,
+            "sndbuf": self.configuration.sndbuf,
+            "bitrate": self.configuration.bitrate,
+            "data_bitrate": self.configuration.data_bitrate,
+        }
+        self.debug(10, "Open port %s", self.configuration.port)
+        try:
+            if self.configuration.keep_connection:
+                can_connection = canconnection.get_connection(self.configuration.port, **settings)
+            else:
+                can_connection = canconnection.CANConnection(self.configuration.port, **settings)
+                can_connection.connect()
+        except IOError as e:
+            print(str(e) + "\n", file=sys.stderr)
+            print(
+                "Is the device connected and powered correctly?\n"
+                "Please use the --port option to select the correct CAN port. Examples:\n"
+                "  --port can0\n",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+        show_progress = self._get_progress_bar(self.configuration.no_progress)
+
+        self.stm32 = bootloader.Stm32Bootloader(
+            can_connection,
+            verbosity=self.configuration.verbosity,
+            show_progress=show_progress,
+            device_family=self.configuration.family,
+            cache_reads=self.configuration.cache_reads,
+        )
+
+
+    def perform_commands(self):
+        """Run all operations as defined by the configuration."""
+        # pylint: disable=too-many-branches
+        # pylint: disable=too-many-statements
+        binary_data = None
+        if self.configuration.write or self.configuration.verify:
+            if self._data_file_loading is None:
+                self.start_loading_data_file()
+            try:
+                binary_data = self._data_file_loading.result()
+            except OSError:
+                self.debug(0, "FAIL: File not found: " + str(self.configuration.data_file))
+                return
+
+        try:
+            if self.configuration.erase:
+                try:
+                    if self.configuration.length is None:
+                        # Erase full device.
+                        self.debug(0, "Performing full erase...")
+                        self.stm32.erase_memory(pages=None)
+                    else:
+                        # Erase from address to address + length.
+                        start_address = self.configuration.address
+                        end_address = self.configuration.address + self.configuration.length
+                        pages = self.stm32.pages_from_range(start_address, end_address)
+                        self.debug(
+                            0,
+                            "Performing partial erase (0x%X - 0x%X, %d pages)... ",
+                            start_address,
+                            end_address,
+                            len(pages),
+                        )
+                        self.stm32.erase_memory(pages)
+
+                except bootloader.CommandError:
+                    # may be caused by readout protection
+                    self.debug(0, "Erase failed.")
+                    sys.exit(1)
+            if self.configuration.write:
+                self.stm32.write_memory_data(self.configuration.address, binary_data)
+            if self.configuration.verify:
+                try:
+                    if self._use_checksum_verify():
+                        self.stm32.verify_checksum(self.configuration.address, binary_data)
+                    else:
+                        read_data = self.stm32.read_memory_data(
+                            self.configuration.address, len(binary_data)
+                        )
+                        bootloader.Stm32Bootloader.verify_data(read_data, binary_data)
+                    self.debug(0, "Verification OK")
+                except bootloader.DataMismatchError as e:
+                    print("Verification FAILED: %s" % e, file=sys.stderr)
+                    sys.exit(1)
+        finally:
+            if binary_data is not None:
+                self._close_data_file(binary_data)
+        if not self.configuration.write and self.configuration.read:
+            self._read_to_file(Path(self.configuration.data_file))
+        if self.configuration.go_address is not None:
+            self.stm32.go(self.configuration.go_address)
+
+    def _read_to_file(self, path):
+        """
+        Stream the configured memory range into the given file.
+
+        The data goes to a temporary file next to it, which only replaces
+        the target once the whole range is read; a failed read leaves no
+        truncated file behind.
+        """
+        out_file = tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=path.name + ".", suffix=".part", delete=False
+        )
+        try:
+            with out_file:
+                self.stm32.read_memory_data(
+                    self.configuration.address, self.configuration.length, out_file=out_file
+                )
+            # The temporary file is private (0600); keep the permissions of
+            # the file it replaces, or use the usual ones for a new file.
+            if path.exists():
+                shutil.copymode(path, out_file.name)
+            else:
+                os.chmod(out_file.name, _READ_FILE_MODE)
+            os.replace(out_file.name, path)
+        except BaseException:
+            os.unlink(out_file.name)
+            raise
+
+    def _use_checksum_verify(self):
+        """Return True if verifying can use the bootloader's CRC command."""
+        if not self.configuration.verify_fast:
+            return False
+        if bootloader.Stm32Bootloader.Command.GET_CHECKSUM in self.stm32.supported_commands:
+            return True
+        self.debug(5, "Bootloader has no checksum command; reading back flash to verify.")
+        return False
+
+    def detect_device(self):
+        boot_version = self.stm32.get()
+        self.debug(0, "Bootloader version: 0x%X", boot_version)
+        self.stm32.detect_device()
+        if self.stm32.device.bootloader_id is not None:
+            self.debug(5, "Bootloader ID: 0x%02X", self.stm32.device.bootloader_id)
+        self.debug(0, "Chip ID: 0x%03X", self.stm32.device.product_id)
+        self.debug(0, "Chip model: %s", self.stm32.device.device_name)
+
+    def read_device_uid(self):
+        """Show chip UID."""
+        try:
+            device_uid = self.stm32.get_uid()
+        except bootloader.CommandError as e:
+            self.debug(
+                0,
+                "Something was wrong with reading chip UID: " + str(e),
+            )
+            return
+
+        if device_uid != bootloader.Stm32Bootloader.UID_NOT_SUPPORTED:
+            device_uid_string = self.stm32.format_uid(device_uid)
+            self.debug(0, "Device UID: %s", device_uid_string)
+
+    def read_flash_size(self):
+        """Show chip flash size."""
+        try:
+            flash_size = self.stm32.get_flash_size()
+        except bootloader.CommandError as e:
+            self.debug(
+                0,
+                "Something was wrong with reading chip flash size: " + str(e),
+            )
+            return
+
+        if flash_size != bootloader.Stm32Bootloader.FLASH_SIZE_UNKNOWN:
+            self.debug(0, "Flash size: %d kiB", flash_size)
+
+    @classmethod
+    def _load_data_file(cls, data_file_path):
+        """Return the content of the given hex or binary file."""
+        if data_file_path.suffix == ".hex":
+            return hexfile.load_hex(data_file_path)
+        return cls._map_file(data_file_path)
+
+    @staticmethod
+    def _map_file(file_path):
+        """
+        Return a read-only view on the file's content, without copying it.
+
+        Close it with _close_data_file() once done.
+        """
+        with open(file_path, "rb") as data_file:
+            try:
+                return memoryview(mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:
+                # An empty file can not be mapped.
+                return memoryview(b"")
+
+    @staticmethod
+    def _close_data_file(data):
+        """Release a view from _map_file() and unmap the file behind it."""
+        if not isinstance(data, memoryview):
+            return
+        mapping = data.obj
+        data.release()
+        if isinstance(mapping, mmap.mmap):
+            mapping.close()
+
+    @staticmethod
+    def _get_progress_bar(no_progress=False):
+        if no_progress:
+            return None
+        # Imported here so that runs without a progress bar skip it.
+        try:
+            # pylint: disable=import-outside-toplevel
+            from progress.bar import ChargingBar as progress_bar
+        except ImportError:
+            return None
+
+        return bootloader.ShowProgress(progress_bar)
+
+
+def main(*arguments, **kwargs):
+    """
+    Parse arguments and execute tasks.
+
+    Default usage is to supply *sys.argv[1:].
+    """
+    error = False
+    loader = Stm32Loader()
+    loader.parse_arguments(arguments)        
+    loader.start_loading_data_file()
+    try:
+        loader.connect()
+    except:
+        loader.debug(0, "CAN connection failed: is the network up?")
+        error = True
+
+    if not error:    
+        try:
+            loader.detect_device()
+        except:
+            loader.debug(0, "Device detect failed: Is the MCU in bootloader mode?")
+            error = True
+    
+    if not error:    
+        try:
+            loader.read_device_uid()
+            loader.read_flash_size()
+            loader.perform_commands()
+        except:
+            loader.debug(0, "Error performing commands")
+            loader.disconnect(force=True)
+            raise
+
+    # A connection that kept failing is not worth keeping for reuse.
+    loader.disconnect(force=error)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -1,8 +1,11 @@
 
+import argparse
 import atexit
+from unittest.mock import patch
 
 import pytest
 
+from stm32loader import args
 from stm32loader.main import Stm32Loader
 
 
@@ -17,7 +20,7 @@ def test_parse_arguments_without_args_raises_typeerror(program):
 
 
 def test_parse_arguments_with_standard_args_passes(program):
-    program.parse_arguments(["-p", "port", "-b", "9600", "-q"])
+    program.parse_arguments(["-p", "port", "--bitrate", "500000", "-q"])
 
 
 @pytest.mark.parametrize(
@@ -43,3 +46,77 @@ def test_parse_arguments_erase_without_port_complains_about_missing_argument(pro
         pytest.skip("Not sure why nothing is captured in some pytest runs?")
     assert "arguments are required: -p/--port" in error_output
     assert "STM32LOADER_SERIAL_PORT" in error_output
+
+
+def test_parse_arguments_runs_argument_parser_once():
+    args._parse_arguments.cache_clear()
+    with patch.object(
+        argparse.ArgumentParser,
+        "parse_args",
+        autospec=True,
+        side_effect=argparse.ArgumentParser.parse_args,
+    ) as parse_args:
+        args.parse_arguments(["-r", "-l", "16", "dump.bin"])
+    assert parse_args.call_count == 1
+
+
+def test_parse_arguments_read_without_length_complains_about_missing_argument(capsys):
+    with pytest.raises(SystemExit):
+        args.parse_arguments(["-r", "dump.bin"])
+    _output, error_output = capsys.readouterr()
+    assert "arguments are required: -l/--length" in error_output
+
+
+def test_parse_arguments_write_without_file_complains_about_missing_argument(capsys):
+    with pytest.raises(SystemExit):
+        args.parse_arguments(["-w"])
+    _output, error_output = capsys.readouterr()
+    assert "arguments are required: FILE.BIN" in error_output
+
+
+def test_parse_arguments_returns_configuration():
+    configuration = args.parse_arguments(["-p", "can0", "-e"])
+    assert isinstance(configuration, args.Configuration)
+    assert configuration.erase
+    assert configuration.length is None
+
+
+def test_parse_arguments_twice_returns_equal_but_separate_configurations():
+    first = args.parse_arguments(["-p", "can0", "-e"])
+    first.port = "can1"
+    second = args.parse_arguments(["-p", "can0", "-e"])
+    assert second is not first
+    assert second.port == "can0"
+    assert second.erase
+
+
+def test_parse_arguments_cache_reads_is_off_unless_given():
+    assert not args.parse_arguments(["-p", "can0", "-e"]).cache_reads
+    assert args.parse_arguments(["-p", "can0", "-e", "--cache-reads"]).cache_reads
+
+
+def test_parse_arguments_keep_connection_is_off_unless_given():
+    assert not args.parse_arguments(["-p", "can0", "-e"]).keep_connection
+    assert args.parse_arguments(["-p", "can0", "-e", "--keep-connection"]).keep_connection
+
+
+def test_parse_arguments_reads_txqueuelen_and_sndbuf_as_integers():
+    configuration = args.parse_arguments(
+        ["-p", "can0", "-e", "--txqueuelen", "500", "--sndbuf", "0x100000"]
+    )
+    assert configuration.txqueuelen == 500
+    assert configuration.sndbuf == 0x100000
+
+
+def test_parse_arguments_data_bitrate_without_bitrate_complains(capsys):
+    with pytest.raises(SystemExit):
+        args.parse_arguments(["-p", "can0", "-e", "--data-bitrate", "2000000"])
+    _output, error_output = capsys.readouterr()
+    assert "argument --data-bitrate: requires --bitrate" in error_output
+
+
+def test_parse_arguments_data_bitrate_with_bitrate_passes():
+    configuration = args.parse_arguments(
+        ["-p", "can0", "-e", "--bitrate", "500000", "--data-bitrate", "2000000"]
+    )
+    assert (configuration.bitrate, configuration.data_bitrate) == (500000, 2000000)
@@ -92,6 +92,25 @@ def test_write_memory_sends_correct_number_of_bytes(bootloader, write):
     assert len(write.written_data) == byte_count
 
 
+def test_write_memory_posts_all_frames_of_a_block_at_once(bootloader, connection):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    connection.max_transfer_size = 64
+    bootloader.write_memory(0, bytearray(range(128)))
+    connection.write_many.assert_called_once()
+    frames = connection.write_many.call_args[0][0]
+    assert [len(frame) for frame in frames] == [65, 65]
+
+
+def test_write_memory_with_memoryview_pads_without_touching_source(bootloader, connection):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    connection.max_transfer_size = 64
+    source = bytearray(b"\x01\x02\x03")
+    bootloader.write_memory(0, memoryview(source))
+    frames = connection.write_many.call_args[0][0]
+    assert frames[0][1:] == b"\x01\x02\x03\xff"
+    assert source == b"\x01\x02\x03"
+
+
 def test_read_memory_with_length_higher_than_256_raises_data_length_error(bootloader):
     with pytest.raises(Stm32.DataLengthError, match=r"Can not read more than 256 bytes at once\."):
         bootloader.read_memory(0, length=257)
@@ -206,6 +225,16 @@ def test_verify_data_with_non_identical_data_raises_verify_error_complaining_abo
         Stm32Bootloader.verify_data(b'\x05\x06', b'\x05\x07')
 
 
+@pytest.mark.parametrize("address", [0x0FFF, 0x1000, 0x2345])
+def test_verify_data_reports_first_mismatch_beyond_first_block(address):
+    reference_data = bytes(0x3000)
+    read_data = bytearray(reference_data)
+    read_data[address] = 0x01
+    read_data[-1] = 0x02
+    with pytest.raises(Stm32.DataMismatchError, match=r"address: 0x%X read 0x1 " % address):
+        Stm32Bootloader.verify_data(read_data, reference_data)
+
+
 @pytest.mark.parametrize(
     # F1, F3, F7
     "pid_bid", [(0x412, None), (0x432, 0x50), (0x452, 0x90)]
@@ -275,9 +304,173 @@ def test_get_pages_from_range_with_invalid_start_address_raises_page_index_error
 
 def test_get_pages_from_range_with_start_address_zero_returns_single_page(bootloader):
     pages = bootloader.pages_from_range(0, 1024)
-    assert pages == [0]
+    assert list(pages) == [0]
 
 
 def test_get_pages_from_large_range_returns_multiple_pages(bootloader):
     pages = bootloader.pages_from_range(5*1024, 20*1024)
-    assert pages == list(range(5, 20))
+    assert pages == range(5, 20)
+
+
+def test_crc32_matches_stm32_crc_unit():
+    # The CRC unit reads the word 0x12345678, stored little-endian.
+    assert Stm32Bootloader.crc32(b"\x78\x56\x34\x12") == 0xDF8A8A2B
+
+
+def test_verify_checksum_with_wrong_device_crc_raises_data_mismatch_error(bootloader, connection):
+    connection.readnewint.side_effect = [
+        (Stm32Bootloader.Reply.ACK, MagicMock()),
+        (0x12345678, MagicMock()),
+        (Stm32Bootloader.Reply.ACK, MagicMock()),
+    ]
+    with pytest.raises(Stm32.DataMismatchError, match="Checksum does not match"):
+        bootloader.verify_checksum(0x08000000, b"\x78\x56\x34\x12")
+
+
+def test_debug_formats_message_only_when_printed(connection, capsys):
+    quiet_bootloader = Stm32Bootloader(connection, verbosity=0)
+    argument = MagicMock()
+    quiet_bootloader.debug(10, "Value: %s", argument)
+    argument.__str__.assert_not_called()
+    quiet_bootloader.debug(0, "Value: %d", 7)
+    assert capsys.readouterr().out == "Value: 7\n"
+
+
+def test_read_memory_data_with_out_file_writes_each_chunk(bootloader):
+    bootloader.data_transfer_size = 256
+    bootloader.read_memory = MagicMock(side_effect=[b"\x01" * 256, b"\x02" * 16])
+    out_file = MagicMock()
+    assert bootloader.read_memory_data(0, 272, out_file=out_file) is None
+    assert [c.args[0] for c in out_file.write.call_args_list] == [b"\x01" * 256, b"\x02" * 16]
+
+
+def test_show_progress_counts_all_steps_when_throttled():
+    bar = MagicMock()
+    show_progress = Stm32.ShowProgress(MagicMock(return_value=bar))
+    with show_progress("Writing", maximum=100) as progress_bar:
+        for _step in range(100):
+            progress_bar.next()
+    assert sum(c.args[0] for c in bar.next.call_args_list) == 100
+    bar.finish.assert_called_once()
+
+
+def test_write_sends_each_argument_as_a_transfer_of_its_own(bootloader, connection):
+    bootloader.write(0x02, b"\x00\x01", 0x03)
+    assert [c.args[0] for c in connection.write.call_args_list] == [b"\x02", b"\x00\x01", b"\x03"]
+
+
+def test_global_erase_sends_the_legacy_two_frames(bootloader, connection):
+    bootloader.extended_erase = False
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    bootloader.erase_memory()
+    frames = [bytes(c.args[0]) for c in connection.write.call_args_list]
+    assert frames == [bytes([Stm32Bootloader.Command.ERASE]), b"\xff", b"\x00"]
+
+
+def test_page_erase_sends_count_page_numbers_and_checksum_as_separate_frames(
+    bootloader, connection
+):
+    bootloader.extended_erase = False
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    bootloader.erase_memory(pages=range(1, 4))
+    frames = [bytes(c.args[0]) for c in connection.write.call_args_list]
+    assert frames == [bytes([Stm32Bootloader.Command.ERASE]), b"\x02", b"\x01\x02\x03", b"\x02"]
+
+
+def test_write_protect_sends_count_page_numbers_and_checksum_as_separate_frames(
+    bootloader, connection
+):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    bootloader.write_protect([0x01, 0x08])
+    frames = [bytes(c.args[0]) for c in connection.write.call_args_list]
+    write_protect = bytes([Stm32Bootloader.Command.WRITE_PROTECT])
+    assert frames == [write_protect, b"\x01", b"\x01\x08", b"\x08"]
+
+
+@pytest.mark.parametrize("data", [b"", b"\x5a", b"\x01\x02\x04", bytes(range(255))])
+def test_xor_checksum_matches_bytewise_xor(data):
+    expected = 0x11
+    for byte in data:
+        expected ^= byte
+    assert Stm32._xor_checksum(data, 0x11) == expected
+
+
+def test_read_memory_data_joins_chunks_in_order(bootloader):
+    bootloader.data_transfer_size = 256
+    bootloader.read_memory = MagicMock(side_effect=[b"\x01" * 256, b"\x02" * 16])
+    assert bootloader.read_memory_data(0, 272) == b"\x01" * 256 + b"\x02" * 16
+
+
+def test_read_memory_command_packs_high_address_unsigned(bootloader, connection, write):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    connection.read.return_value = (bytearray(4), MagicMock())
+    connection.max_transfer_size = 64
+    bootloader.read_memory(0x90000000, 4)
+    assert write.data_was_written(b"\x11\x90\x00\x00\x00\x03")
+
+
+def test_get_remembers_supported_commands(bootloader, connection):
+    replies = [Stm32Bootloader.Reply.ACK, 3, 0x10, 0x00, 0x44, 0xA1, Stm32Bootloader.Reply.ACK]
+    connection.readnewint.side_effect = [(reply, MagicMock()) for reply in replies]
+    assert bootloader.get() == 0x10
+    assert bootloader.supported_commands == {0x00, 0x44, 0xA1}
+    assert bootloader.extended_erase
+
+
+def test_get_with_timeout_reading_supported_commands_raises_command_error(bootloader, connection):
+    replies = [(Stm32Bootloader.Reply.ACK, MagicMock()), (3, MagicMock()), (0x10, MagicMock())]
+    replies += [(0x00, MagicMock()), (None, None)]
+    connection.readnewint.side_effect = replies
+    with pytest.raises(Stm32.CommandError, match="timeout reading supported commands"):
+        bootloader.get()
+
+
+@pytest.mark.parametrize("family, page_size", [(None, 1024), ("F3", 2048), ("H7", 128 * 1024)])
+def test_constructor_sets_flash_page_size_of_family(connection, family, page_size):
+    assert Stm32Bootloader(connection, device_family=family).flash_page_size == page_size
+
+
+def test_extended_erase_memory_with_pages_sends_count_and_page_numbers(
+    bootloader, connection, write
+):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    connection.max_transfer_size = 64
+    bootloader.extended_erase_memory(pages=[1, 0x102])
+    assert write.data_was_written(b"\x44\x00\x01")
+    connection.write_many.assert_called_once_with([b"\x44\x00\x01\x01\x02"])
+
+
+def test_read_memory_data_with_cache_reads_until_memory_changes(connection, write):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    caching_bootloader = Stm32Bootloader(connection, cache_reads=True)
+    caching_bootloader.read_memory = MagicMock(return_value=bytearray(b"\x01\x02"))
+    assert caching_bootloader.read_memory_data(0x1FFF7800, 2) == b"\x01\x02"
+    assert caching_bootloader.read_memory_data(0x1FFF7800, 2) == b"\x01\x02"
+    assert caching_bootloader.read_memory.call_count == 1
+    caching_bootloader.go(0x08000000)
+    caching_bootloader.read_memory_data(0x1FFF7800, 2)
+    assert caching_bootloader.read_memory.call_count == 2
+
+
+def test_uid_and_flash_size_with_cache_reads_read_the_device_once(connection):
+    device = DEVICES[(0x413, None)]
+    caching_bootloader = Stm32Bootloader(
+        connection, device=device, device_family="F4", cache_reads=True
+    )
+    caching_bootloader.read_memory = MagicMock(return_value=bytearray(256))
+    caching_bootloader.get_uid()
+    caching_bootloader.get_flash_size()
+    caching_bootloader.read_memory.assert_called_once_with(0x1FFF7A00, 256)
+
+
+def test_erase_memory_with_pages_sends_count_pages_and_checksum(bootloader, connection, write):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    bootloader._wait_for_ack = MagicMock()
+    bootloader.erase_memory(pages=range(1, 4))
+    assert write.data_was_written(b"\x02\x01\x02\x03\x02")
+
+
+def test_wait_for_ack_reads_a_single_reply(bootloader, connection):
+    connection.readnewint.return_value = (Stm32Bootloader.Reply.ACK, MagicMock())
+    assert bootloader._wait_for_ack("test")
+    assert connection.readnewint.call_count == 1
@@ -0,0 +1,174 @@
+"""Unit tests for the CANConnection class."""
+
+import socket
+import subprocess
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from stm32loader import canconnection
+from stm32loader.canconnection import CANConnection
+
+# pylint: disable=missing-docstring, redefined-outer-name
+
+
+@pytest.fixture
+def bus():
+    bus = MagicMock()
+    bus.socket.getsockopt.return_value = 0
+    with patch.object(canconnection.can.interface, "Bus", return_value=bus):
+        yield bus
+
+
+@pytest.fixture(autouse=True)
+def connection_cache():
+    canconnection._connection_cache.clear()
+    yield canconnection._connection_cache
+    canconnection._connection_cache.clear()
+
+
+def test_get_connection_connects_once_and_reuses_live_connection(bus):
+    first = canconnection.get_connection("can0")
+    second = canconnection.get_connection("can0")
+    assert second is first
+    assert first.bus is bus
+    assert canconnection.can.interface.Bus.call_count == 1
+
+
+def test_get_connection_replaces_connection_with_socket_error(bus):
+    first = canconnection.get_connection("can0")
+    bus.socket.getsockopt.return_value = 100
+    second = canconnection.get_connection("can0")
+    assert second is not first
+    assert canconnection.can.interface.Bus.call_count == 2
+
+
+def test_is_alive_checks_socket_error(bus):
+    connection = CANConnection("can0")
+    assert not connection.is_alive()
+    connection.connect()
+    assert connection.is_alive()
+    bus.socket.getsockopt.assert_called_with(socket.SOL_SOCKET, socket.SO_ERROR)
+    bus.socket.getsockopt.side_effect = OSError
+    assert not connection.is_alive()
+
+
+def test_disconnect_removes_connection_from_cache(bus, connection_cache):
+    connection = canconnection.get_connection("can0")
+    assert connection_cache["can0"] is connection
+    connection.disconnect()
+    assert "can0" not in connection_cache
+    bus.shutdown.assert_called_once()
+    assert canconnection.get_connection("can0") is not connection
+
+
+def test_disconnect_keeps_other_cached_connection(bus, connection_cache):
+    cached = canconnection.get_connection("can0")
+    CANConnection("can0").disconnect()
+    assert connection_cache["can0"] is cached
+
+
+@pytest.fixture
+def run():
+    with patch.object(canconnection.subprocess, "run") as run:
+        yield run
+
+
+def test_connect_with_txqueuelen_sets_interface_queue_length(bus, run):
+    CANConnection("can0", txqueuelen=1000).connect()
+    run.assert_called_once_with(
+        ["ip", "link", "set", "can0", "txqueuelen", "1000"], check=True, capture_output=True
+    )
+
+
+def test_connect_with_sndbuf_sets_send_and_receive_buffer_size(bus, run):
+    CANConnection("can0", sndbuf=65536).connect()
+    assert bus.socket.setsockopt.call_args_list == [
+        ((socket.SOL_SOCKET, socket.SO_SNDBUF, 65536),),
+        ((socket.SOL_SOCKET, socket.SO_RCVBUF, 65536),),
+    ]
+    run.assert_not_called()
+
+
+def test_connect_without_tuning_leaves_interface_alone(bus, run):
+    CANConnection("can0").connect()
+    run.assert_not_called()
+    bus.socket.setsockopt.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "error", [subprocess.CalledProcessError(2, "ip"), OSError("no such file: ip")]
+)
+def test_connect_with_failing_ip_command_reports_and_continues(bus, run, capsys, error):
+    run.side_effect = error
+    connection = CANConnection("can0", txqueuelen=1000)
+    connection.connect()
+    assert connection.bus is bus
+    _output, error_output = capsys.readouterr()
+    assert "Could not run 'ip link set can0 txqueuelen 1000'" in error_output
+
+
+def test_connect_with_failing_setsockopt_reports_and_continues(bus, run, capsys):
+    bus.socket.setsockopt.side_effect = OSError("not permitted")
+    connection = CANConnection("can0", sndbuf=65536)
+    connection.connect()
+    assert connection.bus is bus
+    _output, error_output = capsys.readouterr()
+    assert "Could not set socket buffer size" in error_output
+
+
+def test_connect_with_bitrate_and_data_bitrate_reconfigures_interface_first(bus, run):
+    with patch.object(canconnection.can.interface, "Bus", return_value=bus) as bus_class:
+        run.side_effect = lambda *args, **kwargs: bus_class.assert_not_called()
+        CANConnection("can0", bitrate=500000, data_bitrate=2000000).connect()
+    assert [call.args[0] for call in run.call_args_list] == [
+        ["ip", "link", "set", "can0", "down"],
+        [
+            "ip", "link", "set", "can0",
+            "type", "can", "bitrate", "500000", "dbitrate", "2000000", "fd", "on",
+        ],
+        ["ip", "link", "set", "can0", "up"],
+    ]
+
+
+def test_connect_with_bitrate_only_sets_nominal_bitrate(bus, run):
+    CANConnection("can0", bitrate=500000).connect()
+    assert [call.args[0] for call in run.call_args_list] == [
+        ["ip", "link", "set", "can0", "down"],
+        ["ip", "link", "set", "can0", "type", "can", "bitrate", "500000"],
+        ["ip", "link", "set", "can0", "up"],
+    ]
+
+
+@pytest.mark.parametrize(
+    "arbitration_id, fields",
+    [
+        (0x000000, (0, 0, 0, 0, False)),
+        (0x000001, (0, 0, 0, 0, True)),
+        # Priority 0 with all other fields set.
+        (0x0FFFFF, (0, 0xF, 0x7F, 0xFF, True)),
+        (0x300000, (3, 0, 0, 0, False)),
+        # Priority 2, board 5, command 0x11, request 0x42, error flag set.
+        ((2 << 20) | (5 << 16) | (0x11 << 9) | (0x42 << 1) | 1, (2, 5, 0x11, 0x42, True)),
+    ],
+)
+def test_from_can_msg_splits_arbitration_id_fields(arbitration_id, fields):
+    msg = MagicMock(arbitration_id=arbitration_id)
+    assert CANConnection("can0").from_can_msg(msg) == fields
+
+
+def test_flush_input_buffer_discards_pending_frames(bus):
+    bus.recv.side_effect = [MagicMock(), MagicMock(), None]
+    connection = CANConnection("can0")
+    connection.connect()
+    connection.flush_input_buffer()
+    assert bus.recv.call_count == 3
+    bus.recv.assert_called_with(0.0)
+
+
+def test_flush_input_buffer_stops_on_busy_bus(bus):
+    bus.recv.return_value = MagicMock()
+    connection = CANConnection("can0")
+    connection.connect()
+    connection.flush_input_buffer()
+    assert bus.recv.call_count == canconnection._FLUSH_MAX_FRAMES
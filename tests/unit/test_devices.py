@@ -1,7 +1,7 @@
 
 import pytest
 
-from stm32loader.devices import DEVICES, DEVICE_FAMILIES, DeviceFamily
+from stm32loader.devices import DEVICES, DEVICES_BY_PID, DEVICE_FAMILIES, DeviceFamily, lookup
 from stm32loader.bootloader import CHIP_IDS, Stm32Bootloader
 from devices_stm32flash import DEVICES as STM32FLASH_DEVICES
 
@@ -44,6 +44,27 @@ def test_only_specific_device_names_occur_twice():
         all_names.add(dev.device_name)
 
 
+def test_devices_by_pid_holds_every_device_with_a_fallback():
+    for product_id, candidates in DEVICES_BY_PID.items():
+        assert None in candidates
+        for bootloader_id, dev in candidates.items():
+            assert DEVICES[(product_id, bootloader_id)] is dev
+
+
+def test_device_families_are_keyed_by_family_name():
+    assert set(DEVICE_FAMILIES) == {family.value for family in DeviceFamily}
+    for family in DeviceFamily:
+        assert DEVICE_FAMILIES[family] is DEVICE_FAMILIES[family.value]
+        assert DEVICE_FAMILIES[family].name == family.value
+
+
+def test_lookup_refines_by_bootloader_id_and_falls_back_to_product_id():
+    assert lookup(0x449, 0x90) is DEVICES[(0x449, 0x90)]
+    assert lookup(0x449) is DEVICES[(0x449, None)]
+    assert lookup(0x449, 0xFF) is DEVICES[(0x449, None)]
+    assert lookup(0xFFF) is None
+
+
 @pytest.mark.parametrize(
     "ids",
     DEVICES.keys(),
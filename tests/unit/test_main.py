@@ -0,0 +1,111 @@
+"""Unit tests for the stm32loader command line entry point."""
+
+import stat
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from stm32loader import main as stm32loader_main
+from stm32loader.main import Stm32Loader
+
+# pylint: disable=missing-docstring, redefined-outer-name
+
+
+@pytest.fixture
+def connection():
+    connection = MagicMock()
+
+    def connect(loader):
+        loader.stm32 = MagicMock()
+        loader.stm32.connection = connection
+
+    with patch.object(Stm32Loader, "connect", autospec=True, side_effect=connect):
+        yield connection
+
+
+def test_main_with_keep_connection_leaves_connection_open(connection):
+    with patch.object(Stm32Loader, "detect_device"), patch.object(
+        Stm32Loader, "perform_commands"
+    ), patch.object(Stm32Loader, "read_device_uid"), patch.object(Stm32Loader, "read_flash_size"):
+        stm32loader_main.main("-p", "can0", "--keep-connection", "-q")
+    connection.disconnect.assert_not_called()
+
+
+def test_main_with_keep_connection_closes_connection_after_failed_detection(connection):
+    with patch.object(Stm32Loader, "detect_device", side_effect=IOError):
+        stm32loader_main.main("-p", "can0", "--keep-connection", "-q")
+    connection.disconnect.assert_called_once()
+
+
+def test_main_without_keep_connection_closes_connection(connection):
+    with patch.object(Stm32Loader, "detect_device"), patch.object(
+        Stm32Loader, "perform_commands"
+    ), patch.object(Stm32Loader, "read_device_uid"), patch.object(Stm32Loader, "read_flash_size"):
+        stm32loader_main.main("-p", "can0", "-q")
+    connection.disconnect.assert_called_once()
+
+
+def _reading_loader(data_file, read_memory_data):
+    loader = Stm32Loader()
+    loader.parse_arguments(["-p", "can0", "-r", "-a", "0x08000000", "-l", "4", str(data_file)])
+    loader.stm32 = MagicMock()
+    loader.stm32.read_memory_data.side_effect = read_memory_data
+    return loader
+
+
+def test_perform_commands_read_writes_data_file(tmp_path):
+    data_file = tmp_path / "dump.bin"
+
+    def read_memory_data(address, length, out_file):
+        out_file.write(b"\x01\x02\x03\x04")
+
+    _reading_loader(data_file, read_memory_data).perform_commands()
+    assert data_file.read_bytes() == b"\x01\x02\x03\x04"
+    assert list(tmp_path.iterdir()) == [data_file]
+
+
+def test_perform_commands_failed_read_leaves_no_partial_file(tmp_path):
+    data_file = tmp_path / "dump.bin"
+    data_file.write_bytes(b"previous")
+
+    def read_memory_data(address, length, out_file):
+        out_file.write(b"\x01\x02")
+        raise stm32loader_main.bootloader.CommandError("Read memory timeout")
+
+    with pytest.raises(stm32loader_main.bootloader.CommandError):
+        _reading_loader(data_file, read_memory_data).perform_commands()
+    assert data_file.read_bytes() == b"previous"
+    assert list(tmp_path.iterdir()) == [data_file]
+
+
+def _write_four_bytes(address, length, out_file):
+    out_file.write(b"\x01\x02\x03\x04")
+
+
+def test_perform_commands_read_creates_data_file_with_default_permissions(tmp_path):
+    data_file = tmp_path / "dump.bin"
+    _reading_loader(data_file, _write_four_bytes).perform_commands()
+    assert stat.S_IMODE(data_file.stat().st_mode) == 0o644
+
+
+def test_perform_commands_read_keeps_permissions_of_existing_data_file(tmp_path):
+    data_file = tmp_path / "dump.bin"
+    data_file.write_bytes(b"previous")
+    data_file.chmod(0o640)
+    _reading_loader(data_file, _write_four_bytes).perform_commands()
+    assert data_file.read_bytes() == b"\x01\x02\x03\x04"
+    assert stat.S_IMODE(data_file.stat().st_mode) == 0o640
+
+
+def test_perform_commands_write_unmaps_data_file_afterwards(tmp_path):
+    data_file = tmp_path / "firmware.bin"
+    data_file.write_bytes(b"\x01\x02\x03\x04")
+    loader = Stm32Loader()
+    loader.parse_arguments(["-p", "can0", "-w", str(data_file)])
+    loader.stm32 = MagicMock()
+    written = []
+    loader.stm32.write_memory_data.side_effect = lambda address, data: written.append(data)
+    loader.perform_commands()
+    assert len(written) == 1
+    with pytest.raises(ValueError):
+        bytes(written[0])